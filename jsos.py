@@ -9,13 +9,21 @@ This class allows to connect to JSOS end extract data such as:
 __author__ = 'Arqsz'
 
 from time import sleep as wait
+import re
 from bs4 import BeautifulSoup
-import requests as r
+from ratelimit import RateLimitedSession
 import config  # noqa: F401
 import logging
+import weakref
 
 log = logging.getLogger('jsos2mail')
 
+# Mailbox table and its unread rows, matched by whole class token
+MAILBOX_TABLE_RE = re.compile(
+    r'<table\b[^>]*\bclass="(?:[^"]*\s)?table-mailbox(?:\s[^"]*)?"')
+UNREAD_ROW_RE = re.compile(
+    r'<tr\b[^>]*\bclass="(?:[^"]*\s)?unread(?:\s[^"]*)?"')
+
 
 class Jsos:
     """
@@ -44,12 +52,13 @@ class Jsos:
             the password of the user
         """
 
-        self.session = r.Session()
+        self.session = RateLimitedSession(account=username)
         self.base_oauth_url = "https://oauth.pwr.edu.pl"
         self.base_jsos_url = "https://jsos.pwr.edu.pl"
         self.username = username
         self.password = password
         self.__is_logged = False
+        self.__messages = weakref.WeakSet()
 
     def __enter__(self):
         log.info("Starting coonnection with JSOS")
@@ -194,6 +203,7 @@ class Jsos:
             raise JsosAuthException("User not logged in")
         log.info("Processing logout")
         self.__logout()
+        self.__release_messages()
         if force:
             self.__clear_data()
 
@@ -206,7 +216,14 @@ class Jsos:
         else:
             raise JsosAuthException("Cannot log user out")
 
+    def __release_messages(self):
+        # Messages must not keep this object (and its session) alive
+        for message in list(self.__messages):
+            message._release()
+        self.__messages.clear()
+
     def __clear_data(self):
+        self.__release_messages()
         self.session = None
         self.username = None
         self.password = None
@@ -236,6 +253,11 @@ class Jsos:
         max : int, optional
             ow many messages to retrieve (default is 3)
 
+        Returns
+        -------
+        list
+            list of JsosMessage objects
+
         Raises
         ------
         JsosAuthException
@@ -246,9 +268,17 @@ class Jsos:
         if not self.__is_logged:
             raise JsosAuthException("User not logged in")
 
-        messages_url = self.base_jsos_url + '/index.php/student/wiadomosci'
-        response = self.session.get(messages_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
+        page = None
+        if only_unread:
+            count, page = self.__probe_unread()
+            if count == 0:
+                log.info("No new messages")
+                return []
+
+        if page is None:
+            messages_url = self.base_jsos_url + '/index.php/student/wiadomosci'
+            page = self.session.get(messages_url).text
+        soup = BeautifulSoup(page, 'html.parser')
         messages_table = soup.find(class_='table-mailbox')
         if not messages_table:
             log.warning("Probably logged out from JSOS - logging in again")
@@ -267,17 +297,26 @@ class Jsos:
         messages = []
         for tr in message_trs:
             message_url = self.base_jsos_url + tr.attrs['data-url']
-            message = dict()
             message_tds = tr.find_all('td')
-            message['from'] = message_tds[1].contents[0]
-            message['topic'] = message_tds[2].contents[0]
-            message['date'] = message_tds[3].contents[0]
-            message['html_content'] = self.__get_message_content(message_url)
+            message = JsosMessage(
+                msg_from=str(message_tds[1].contents[0]),
+                topic=str(message_tds[2].contents[0]),
+                date=str(message_tds[3].contents[0]),
+                url=message_url,
+                fetch_content=self.__get_message_content
+            )
+            self.__messages.add(message)
             messages.append(message)
 
+        # Messages keep only plain strings, so the tree can be released
+        soup.decompose()
+
         return messages
 
     def __get_message_content(self, url: str) -> str:
+        if not self.__is_logged or self.session is None:
+            raise JsosAuthException("User not logged in")
+
         response = self.session.get(url)
         soup = BeautifulSoup(response.text, 'html.parser')
         webpage_content = soup.find(id='content-mail').contents[1]
@@ -293,11 +332,76 @@ class Jsos:
 
         return message_body_string
 
+    def get_unread_count(self):
+        """Gets number of unread messages without parsing mailbox
+
+        Page is streamed and unread rows of mailbox are counted with
+        regular expressions. Use `get_messages` to get messages,
+        as it reuses downloaded page.
+
+        Returns
+        -------
+        int or None
+            number of unread messages or None if mailbox was not found
+            (e.g. user was logged out from JSOS)
+
+        Raises
+        ------
+        JsosAuthException
+            If user is not logged in.
+
+        """
+
+        if not self.__is_logged:
+            raise JsosAuthException("User not logged in")
+
+        return self.__probe_unread()[0]
+
+    def __probe_unread(self) -> tuple:
+        """Streams mailbox page looking for unread messages count
+
+        Returns tuple of count (or None if mailbox was not found) and
+        whole downloaded page.
+        """
+
+        messages_url = self.base_jsos_url + '/index.php/student/wiadomosci'
+        chunks = []
+        buffer = ''
+        in_table = False
+        count = 0
+        with self.session.get(messages_url, stream=True) as response:
+            if not response.encoding:
+                response.encoding = 'utf-8'
+            for chunk in response.iter_content(4096, decode_unicode=True):
+                chunks.append(chunk)
+                buffer += chunk
+                if not in_table:
+                    match = MAILBOX_TABLE_RE.search(buffer)
+                    if not match:
+                        continue
+                    in_table = True
+                    buffer = buffer[match.end():]
+
+                last_end = 0
+                for match in UNREAD_ROW_RE.finditer(buffer):
+                    count += 1
+                    last_end = match.end()
+                # Keep last tag in case it is split between chunks
+                tag_start = buffer.rfind('<', last_end)
+                buffer = buffer[tag_start:] if tag_start != -1 else ''
+
+        page = ''.join(chunks)
+        if not in_table:
+            return None, page
+        return count, page
+
     def has_unread_messages(self, messages_table=None):
         """Checks whether user has unread messages
 
         If the argument `messages_table` is passed in,
-        looks for messages in given htmls.
+        looks for messages in given htmls. Otherwise unread
+        messages are counted with `get_unread_count`.
+        If mailbox is not found, user is logged in again.
 
         Parameters
         ----------
@@ -309,15 +413,22 @@ class Jsos:
         JsosAuthException
             If user is not logged in.
 
+        JsosConnectionException
+            If mailbox cannot be found even after logging in again.
+
         """
         if not self.__is_logged:
             raise JsosAuthException("User not logged in")
 
         if messages_table is None:
-            messages_url = self.base_jsos_url + '/index.php/student/wiadomosci'
-            response = self.session.get(messages_url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            messages_table = soup.find(class_='table-mailbox')
+            count = self.get_unread_count()
+            if count is None:
+                log.warning("Probably logged out from JSOS - logging in again")
+                self.login()
+                count = self.get_unread_count()
+            if count is None:
+                raise JsosConnectionException("Mailbox not found")
+            return count > 0
 
         unread_messages = messages_table.find_all(class_='unread')
         if len(unread_messages) == 0:
@@ -326,6 +437,92 @@ class Jsos:
             return True
 
 
+class JsosMessage:
+    """
+    Single message from JSOS mailbox.
+
+    Headers are stored as plain strings. Content of the message is
+    fetched from JSOS on first access to `html_content`, so it has to
+    be read before the Jsos session is closed.
+
+    Until content is fetched, message keeps a reference to the Jsos
+    object that created it (with its session and credentials). This
+    reference is dropped on logout, after which not yet fetched
+    content is no longer available.
+
+    Attributes
+    ----------
+    msg_from : str
+        sender of the message
+    topic : str
+        topic of the message
+    date : str
+        date of the message
+    html_content : str
+        html content of the message (fetched lazily)
+    """
+
+    __slots__ = ('_msg_from', '_topic', '_date', '_url',
+                 '_fetch_content', '_html_content', '__weakref__')
+
+    def __init__(
+            self, msg_from: str, topic: str, date: str,
+            url: str, fetch_content
+    ):
+        """
+        Parameters
+        ----------
+        msg_from : str
+            sender of the message
+        topic : str
+            topic of the message
+        date : str
+            date of the message
+        url : str
+            url of the message's page
+        fetch_content : callable
+            function that returns html content of the message for given url
+        """
+
+        self._msg_from = msg_from
+        self._topic = topic
+        self._date = date
+        self._url = url
+        self._fetch_content = fetch_content
+        self._html_content = None
+
+    def __repr__(self):
+        return "JsosMessage(msg_from={!r}, topic={!r}, date={!r})".format(
+            self._msg_from, self._topic, self._date)
+
+    @property
+    def msg_from(self) -> str:
+        return self._msg_from
+
+    @property
+    def topic(self) -> str:
+        return self._topic
+
+    @property
+    def date(self) -> str:
+        return self._date
+
+    @property
+    def html_content(self) -> str:
+        if self._html_content is None:
+            if self._fetch_content is None:
+                raise JsosAuthException("User not logged in")
+            self._html_content = self._fetch_content(self._url)
+            # Drop reference to Jsos object once content is known
+            self._fetch_content = None
+        return self._html_content
+
+    def _release(self):
+        """Drops reference to Jsos object used to fetch content"""
+
+        self._fetch_content = None
+
+
 class JsosException(Exception):
     pass
 
@@ -10,7 +10,8 @@ import argparse
 from getpass import getpass
 from os import getenv
 from jsos import Jsos
-from studentmail import StudentMail
+from studentmail import StudentMail, DEFAULT_SERVER_HOST
+from ratelimit import limiter, JSOS_HOSTS, JSOS_BUDGET, MAIL_BUDGET
 from time import sleep as wait
 
 log = logging.getLogger('jsos2mail')
@@ -57,6 +58,19 @@ def check_mail_creds(email, password):
     return s.is_user_exists()
 
 
+def positive_float(value):
+    """Parses positive float argument"""
+
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(
+            "{} is not a positive number".format(value))
+    return number
+
+
 def check_jsos_creds(username, password):
     """Checks if credentials are correct"""
 
@@ -90,6 +104,17 @@ if __name__ == "__main__":
         action='store_true',
         default=False
     )
+    parser.add_argument(
+        "--jsos-rate",
+        help="max requests per second sent to JSOS (default: %(default)s)",
+        type=positive_float, default=JSOS_BUDGET[0]
+    )
+    parser.add_argument(
+        "--mail-rate",
+        help="max emails per second sent to mail server "
+             "(default: %(default)s)",
+        type=positive_float, default=MAIL_BUDGET[0]
+    )
     parser.add_argument("--jsos-usr", help="jsos username", type=str)
     parser.add_argument("--jsos-pwd", help="jsos password", type=str)
     parser.add_argument("--email", help="your email", type=str)
@@ -99,6 +124,11 @@ if __name__ == "__main__":
 
     WAIT_TIME = args.wait_time
 
+    for host in JSOS_HOSTS:
+        limiter.set_budget(host, args.jsos_rate, burst=JSOS_BUDGET[1])
+    limiter.set_budget(
+        DEFAULT_SERVER_HOST, args.mail_rate, burst=MAIL_BUDGET[1])
+
     if args.no_input:
         if args.email and args.email_pwd and args.jsos_usr and args.jsos_pwd:
             mail_addr = args.email
@@ -135,10 +165,16 @@ if __name__ == "__main__":
             msgs = jsos.get_messages(max=3, only_unread=True)
             for msg in msgs:
                 mail.prepare_message()
-                mail.prepare_headers(subject=msg['topic'])
+                mail.prepare_headers(subject=msg.topic)
                 mail.prepare_content(
-                    content=msg['html_content'], msg_from=msg['from'])
+                    content=msg.html_content, msg_from=msg.msg_from)
                 mail.send()
+        for host, stats in limiter.stats().items():
+            log.info(
+                "{}: {} requests, {:.2f} sec max queueing delay "
+                "in last scan".format(
+                    host, stats['requests'], stats['max_delay']))
+        limiter.reset_stats()
         log.info(f"Sleeping for {WAIT_TIME} sec")
         try:
             wait(WAIT_TIME)
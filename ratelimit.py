@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+"""Process-wide rate limiter for requests to JSOS and mail servers
+
+Every host has its own token bucket. Requests waiting for the same host
+are served round-robin between accounts, so one busy account cannot
+starve the others.
+"""
+
+__author__ = 'Arqsz'
+
+from collections import OrderedDict, deque
+from time import monotonic
+from urllib.parse import urlparse
+
+import logging
+import threading
+import requests as r
+import config  # noqa: F401
+
+log = logging.getLogger('jsos2mail')
+
+JSOS_HOSTS = ('jsos.pwr.edu.pl', 'oauth.pwr.edu.pl')
+MAIL_HOSTS = ('smtp.gmail.com',)
+
+# (rate, burst) used for JSOS and mail servers
+JSOS_BUDGET = (1.0, 5)
+MAIL_BUDGET = (0.2, 5)
+
+DEFAULT_BUDGETS = dict(
+    [(host, JSOS_BUDGET) for host in JSOS_HOSTS]
+    + [(host, MAIL_BUDGET) for host in MAIL_HOSTS]
+)
+
+
+class TokenBucket:
+    """
+    Token bucket shared by all accounts talking to a single host.
+
+    Attributes
+    ----------
+    rate : float
+        number of tokens added per second
+    burst : int
+        maximum number of tokens stored in bucket
+
+    Methods
+    -------
+    acquire(account=None)
+        Blocks until a token is granted to given account
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Parameters
+        ----------
+        rate : float
+            number of tokens added per second
+        burst : int, optional
+            maximum number of tokens stored in bucket (default is 1)
+        """
+
+        if rate <= 0 or burst < 1:
+            raise RateLimitException(
+                "Rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.__tokens = float(burst)
+        self.__last = monotonic()
+        self.__cond = threading.Condition()
+        self.__queues = OrderedDict()
+
+    def __refill(self):
+        now = monotonic()
+        self.__tokens = min(
+            self.burst, self.__tokens + (now - self.__last) * self.rate)
+        self.__last = now
+
+    def __next_ticket(self):
+        for queue in self.__queues.values():
+            if queue:
+                return queue[0]
+        return None
+
+    def acquire(self, account: str = None) -> float:
+        """Blocks until a token is granted to given account
+
+        Parameters
+        ----------
+        account : str, optional
+            account on whose behalf the request is made (default is None)
+
+        Returns
+        -------
+        float
+            time in seconds spent waiting in queue
+
+        """
+
+        ticket = object()
+        start = monotonic()
+        with self.__cond:
+            self.__queues.setdefault(account, deque()).append(ticket)
+            try:
+                while True:
+                    self.__refill()
+                    if self.__tokens >= 1 and \
+                            self.__next_ticket() is ticket:
+                        break
+                    # Always use timeout, so a lost notify cannot block
+                    # forever
+                    if self.__tokens < 1:
+                        self.__cond.wait((1 - self.__tokens) / self.rate)
+                    else:
+                        self.__cond.wait(1 / self.rate)
+            except BaseException:
+                # Do not leave orphaned ticket blocking other waiters
+                queue = self.__queues.get(account)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self.__queues[account]
+                self.__cond.notify_all()
+                raise
+
+            self.__tokens -= 1
+            queue = self.__queues[account]
+            queue.popleft()
+            # Move account to the end, so others are served first
+            del self.__queues[account]
+            if queue:
+                self.__queues[account] = queue
+            self.__cond.notify_all()
+
+        return monotonic() - start
+
+
+class RateLimiter:
+    """
+    Collection of token buckets, one per host.
+
+    Hosts without configured budget are not limited.
+
+    Methods
+    -------
+    set_budget(host, rate, burst=1)
+        Sets request budget for host
+    acquire(host, account=None)
+        Blocks until request to host may be sent
+    stats()
+        Returns queueing delay statistics per host
+    reset_stats()
+        Clears queueing delay statistics
+    """
+
+    def __init__(self, budgets: dict = None):
+        """
+        Parameters
+        ----------
+        budgets : dict, optional
+            mapping of host to (rate, burst) tuple (default is None)
+        """
+
+        self.__lock = threading.Lock()
+        self.__buckets = dict()
+        self.__stats = dict()
+        for host, (rate, burst) in (budgets or {}).items():
+            self.set_budget(host, rate, burst)
+
+    def set_budget(self, host: str, rate: float, burst: int = 1):
+        """Sets request budget for host
+
+        If host already has the same budget, its bucket is kept.
+
+        Parameters
+        ----------
+        host : str
+            hostname the budget applies to
+        rate : float
+            allowed requests per second
+        burst : int, optional
+            how many requests may be sent at once (default is 1)
+
+        Raises
+        ------
+        RateLimitException
+            If rate or burst is not positive.
+
+        """
+
+        bucket = TokenBucket(rate, burst)
+        with self.__lock:
+            current = self.__buckets.get(host)
+            if current and (current.rate, current.burst) == (rate, burst):
+                return
+            self.__buckets[host] = bucket
+
+    def acquire(self, host: str, account: str = None) -> float:
+        """Blocks until request to host may be sent
+
+        Parameters
+        ----------
+        host : str
+            hostname the request is sent to
+        account : str, optional
+            account on whose behalf the request is made (default is None)
+
+        Returns
+        -------
+        float
+            time in seconds spent waiting in queue
+
+        """
+
+        with self.__lock:
+            bucket = self.__buckets.get(host)
+        if bucket is None:
+            return 0.0
+
+        delay = bucket.acquire(account)
+        with self.__lock:
+            stats = self.__stats.setdefault(
+                host, {'requests': 0, 'total_delay': 0.0, 'max_delay': 0.0})
+            stats['requests'] += 1
+            stats['total_delay'] += delay
+            stats['max_delay'] = max(stats['max_delay'], delay)
+        if delay > 0.01:
+            log.debug("Request to {} queued for {:.2f} sec".format(
+                host, delay))
+        return delay
+
+    def stats(self) -> dict:
+        """Returns queueing delay statistics per host
+
+        Returns
+        -------
+        dict
+            mapping of host to dict with `requests`, `total_delay`
+            and `max_delay` keys
+
+        """
+
+        with self.__lock:
+            return {host: dict(s) for host, s in self.__stats.items()}
+
+    def reset_stats(self):
+        """Clears queueing delay statistics"""
+
+        with self.__lock:
+            self.__stats.clear()
+
+
+class RateLimitedSession(r.Session):
+    """
+    Requests session that passes every request through rate limiter.
+
+    Redirects are limited as well, as each of them is a separate request.
+    """
+
+    def __init__(self, account: str = None, rate_limiter: RateLimiter = None):
+        """
+        Parameters
+        ----------
+        account : str, optional
+            account on whose behalf requests are made (default is None)
+        rate_limiter : RateLimiter, optional
+            limiter to use (default is process-wide `limiter`)
+        """
+
+        super().__init__()
+        self.account = account
+        self.rate_limiter = rate_limiter or limiter
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname
+        self.rate_limiter.acquire(host, account=self.account)
+        return super().send(request, **kwargs)
+
+
+class RateLimitException(Exception):
+    pass
+
+
+limiter = RateLimiter(DEFAULT_BUDGETS)
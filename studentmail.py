@@ -14,6 +14,10 @@ import logging
 import smtplib
 import config  # noqa: F401
 
+from ratelimit import limiter
+
+DEFAULT_SERVER_HOST = 'smtp.gmail.com'
+
 log = logging.getLogger('jsos2mail')
 
 
@@ -31,6 +35,8 @@ class StudentMail:
         host of email smtp server
     port : int, optional
         port of email smtp server
+    rate_limiter : RateLimiter, optional
+        limiter used to pace sending (default is process-wide `limiter`)
 
     Methods
     -------
@@ -50,13 +56,14 @@ class StudentMail:
 
     def __init__(
             self, email: str,
-            password: str, server_host: str = 'smtp.gmail.com',
-            port: int = 587
+            password: str, server_host: str = DEFAULT_SERVER_HOST,
+            port: int = 587, rate_limiter=None
     ):
         self.email = email
         self.password = password
         self.server_host = server_host
         self.port = port
+        self.rate_limiter = rate_limiter or limiter
         self.server = smtplib.SMTP(host=self.server_host, port=self.port)
         self.message = None
         self.__headers_prepared = False
@@ -177,6 +184,7 @@ class StudentMail:
         """Sends message to receiver
 
         If `receiver` is not set, user's mail is being choosen.
+        Sending is paced by `rate_limiter`.
 
         Parameters
         ----------
@@ -197,6 +205,7 @@ class StudentMail:
         if not receiver:
             receiver = self.email
 
+        self.rate_limiter.acquire(self.server_host, account=self.email)
         self.server.sendmail(
             self.email, receiver, self.message.as_string()
         )